@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-19 06:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generator', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repository',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
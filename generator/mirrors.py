@@ -0,0 +1,258 @@
+import base64
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+# Defaults, overridable in settings.py
+DEFAULT_MIRROR_MAX_BYTES = 2 * 1024 ** 3   # disk budget for all mirrors together
+DEFAULT_MIRROR_MIN_IDLE = 300              # seconds a used mirror is safe from eviction
+DEFAULT_GIT_TIMEOUT = 30                   # seconds per git command
+
+
+class MirrorError(Exception):
+    pass
+
+
+def _git(args, cwd=None, token=None, input=None):
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    if token:
+        # Pass credentials through the environment so they never land in a config file
+        credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        env.update({
+            'GIT_CONFIG_COUNT': '1',
+            'GIT_CONFIG_KEY_0': 'http.extraHeader',
+            'GIT_CONFIG_VALUE_0': f"Authorization: Basic {credentials}",
+        })
+    try:
+        result = subprocess.run(
+            ['git', *args], cwd=cwd, env=env, input=input, capture_output=True,
+            timeout=getattr(settings, 'GIT_TIMEOUT', DEFAULT_GIT_TIMEOUT)
+        )
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise MirrorError(f"git {args[0]} failed: {e}")
+    if result.returncode != 0:
+        raise MirrorError(f"git {args[0]} failed: {result.stderr.decode(errors='ignore').strip()}")
+    return result.stdout
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class MirrorPool:
+    """
+    Bounded on-disk pool of shallow, blobless bare clones keyed by owner/repo.
+    Mirrors are refreshed with an incremental fetch and evicted least recently
+    used first once the pool grows past max_bytes. Mirrors used within the
+    last min_idle seconds are never evicted, which protects readers in other
+    processes that the in-process locks cannot see.
+    """
+
+    def __init__(self, root, max_bytes, min_idle=DEFAULT_MIRROR_MIN_IDLE):
+        self.root = str(root)
+        self.max_bytes = max_bytes
+        self.min_idle = min_idle
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._sizes = None   # path -> bytes, filled by the first evict()
+        self._sizes_lock = threading.Lock()
+
+    def path_for(self, full_name):
+        return os.path.join(self.root, re.sub(r'[^\w.-]', '_', full_name.lower().replace('/', '__')) + '.git')
+
+    def _lock(self, path):
+        with self._locks_lock:
+            return self._locks.setdefault(path, threading.Lock())
+
+    @contextmanager
+    def checkout(self, full_name, clone_url, branch=None, token=None):
+        """
+        Clone or incrementally update the mirror and yield its path. The mirror
+        is locked against eviction until the block exits.
+        """
+        path = self.path_for(full_name)
+        with self._lock(path):
+            try:
+                if os.path.isdir(path):
+                    try:
+                        self._fetch(path, branch, token)
+                    except MirrorError as e:
+                        # A killed fetch can leave locks behind and storage can
+                        # be damaged; start over from a fresh clone once
+                        print(f"WARNING: rebuilding mirror {full_name}: {str(e)}")
+                        shutil.rmtree(path, ignore_errors=True)
+                        self._clone(path, clone_url, branch, token)
+                else:
+                    self._clone(path, clone_url, branch, token)
+                # Directory mtime is the LRU timestamp
+                os.utime(path)
+                self._measure(path)
+            except OSError as e:
+                raise MirrorError(f"mirror {full_name} unavailable: {e}")
+            yield path
+        if not self._within_budget():
+            try:
+                self.evict(keep=path)
+            except OSError as e:
+                print(f"WARNING: mirror eviction failed: {str(e)}")
+
+    def _clone(self, path, clone_url, branch, token):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = tempfile.mkdtemp(dir=self.root, prefix='.clone-')
+        try:
+            args = ['clone', '--bare', '--depth=1', '--filter=blob:none', '--single-branch', '--no-tags']
+            if branch:
+                args += ['--branch', branch]
+            _git(args + [clone_url, tmp], token=token)
+            try:
+                os.rename(tmp, path)
+            except OSError:
+                # Another process finished cloning the same repo first
+                if not os.path.isdir(path):
+                    raise
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _fetch(self, path, branch, token):
+        if not branch:
+            branch = _git(['symbolic-ref', '--short', 'HEAD'], cwd=path).decode().strip()
+        _git([
+            'fetch', '--depth=1', '--filter=blob:none', '--no-tags', 'origin',
+            f"+refs/heads/{branch}:refs/heads/{branch}",
+        ], cwd=path, token=token)
+        _git(['symbolic-ref', 'HEAD', f"refs/heads/{branch}"], cwd=path)
+
+    def list_files(self, path):
+        """Return (path, oid) for every file at HEAD, without fetching any blobs"""
+        output = _git(['ls-tree', '-r', '-z', '--full-tree', 'HEAD'], cwd=path)
+        files = []
+        for entry in output.split(b'\0'):
+            if not entry:
+                continue
+            meta, name = entry.split(b'\t', 1)
+            _, kind, oid = meta.split()
+            if kind == b'blob':
+                files.append((name.decode(errors='ignore'), oid.decode()))
+        return files
+
+    def read_blobs(self, path, oids, token=None):
+        """Return {oid: bytes}, fetching any blobs not yet local in one round trip"""
+        if not oids:
+            return {}
+        wanted = set(oids)
+        listing = _git(['rev-list', '--objects', '--missing=print', 'HEAD'], cwd=path)
+        missing = [
+            line[1:] for line in listing.decode().splitlines()
+            if line.startswith('?') and line[1:] in wanted
+        ]
+        if missing:
+            _git([
+                '-c', 'fetch.negotiationAlgorithm=noop', 'fetch', 'origin', '--no-tags',
+                '--no-write-fetch-head', '--recurse-submodules=no', '--filter=blob:none', '--stdin',
+            ], cwd=path, token=token, input='\n'.join(missing).encode() + b'\n')
+
+        output = _git(['cat-file', '--batch'], cwd=path, token=token,
+                      input='\n'.join(oids).encode() + b'\n')
+        blobs = {}
+        position = 0
+        while position < len(output):
+            end = output.index(b'\n', position)
+            header = output[position:end].split()
+            position = end + 1
+            if len(header) != 3:
+                continue  # "<oid> missing"
+            size = int(header[2])
+            blobs[header[0].decode()] = output[position:position + size]
+            position += size + 1
+        return blobs
+
+    def _measure(self, path):
+        """Re-measure one mirror after it changed"""
+        size = _dir_size(path)
+        with self._sizes_lock:
+            if self._sizes is not None:
+                self._sizes[path] = size
+
+    def _within_budget(self):
+        with self._sizes_lock:
+            return self._sizes is not None and sum(self._sizes.values()) <= self.max_bytes
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used mirrors until the pool fits its budget.
+        Sizes are cached per mirror, so only mirrors not seen before (such as
+        ones cloned by another process) are walked.
+        """
+        if not os.path.isdir(self.root):
+            return
+        mirrors = []
+        now = time.time()
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not (name.endswith('.git') and os.path.isdir(path)):
+                continue
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue  # removed concurrently
+            with self._sizes_lock:
+                known = self._sizes is not None and path in self._sizes
+            if not known:
+                size = _dir_size(path)
+                with self._sizes_lock:
+                    if self._sizes is None:
+                        self._sizes = {}
+                    self._sizes[path] = size
+            mirrors.append((mtime, path, now - mtime < self.min_idle))
+
+        with self._sizes_lock:
+            if self._sizes is None:
+                self._sizes = {}
+            on_disk = {path for _, path, _ in mirrors}
+            for path in set(self._sizes) - on_disk:
+                del self._sizes[path]
+            total = sum(self._sizes.values())
+
+        for _, path, recent in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            if path == keep or recent:
+                continue
+            lock = self._lock(path)
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+                with self._sizes_lock:
+                    total -= self._sizes.pop(path, 0)
+            finally:
+                lock.release()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_mirror_pool():
+    root = str(getattr(settings, 'MIRROR_ROOT', os.path.join(settings.BASE_DIR, 'mirrors')))
+    max_bytes = getattr(settings, 'MIRROR_MAX_BYTES', DEFAULT_MIRROR_MAX_BYTES)
+    min_idle = getattr(settings, 'MIRROR_MIN_IDLE', DEFAULT_MIRROR_MIN_IDLE)
+    with _pools_lock:
+        key = (root, max_bytes, min_idle)
+        if key not in _pools:
+            _pools[key] = MirrorPool(root, max_bytes, min_idle)
+        return _pools[key]
@@ -13,6 +13,7 @@ class Repository(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     readme_content = models.TextField(blank=True)
+    version = models.PositiveIntegerField(default=1)
     language_stats = models.JSONField(default=dict, blank=True)
     topics = models.JSONField(default=list, blank=True)
     
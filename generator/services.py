@@ -3,10 +3,12 @@ import re
 import google.generativeai as genai
 from github import Github
 from dotenv import load_dotenv
+from django.conf import settings
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from markdown import markdown
 from html.parser import HTMLParser
+from .mirrors import MirrorError, get_mirror_pool
 
 load_dotenv()
 
@@ -37,6 +39,316 @@ def validate_markdown(content):
     except Exception as e:
         raise ValidationError(f"Markdown validation failed: {str(e)}")
 
+# --- Single Gemini call shared by full and per-section generation ---
+def _call_model(prompt, max_output_tokens=2048):
+    response = model.generate_content(
+        prompt,
+        safety_settings={
+            'HARM_CATEGORY_HARASSMENT': 'BLOCK_NONE',
+            'HARM_CATEGORY_HATE_SPEECH': 'BLOCK_NONE',
+            'HARM_CATEGORY_SEXUALLY_EXPLICIT': 'BLOCK_NONE',
+            'HARM_CATEGORY_DANGEROUS_CONTENT': 'BLOCK_NONE',
+        },
+        generation_config={
+            'temperature': 0.7,
+            'top_p': 0.9,
+            'max_output_tokens': max_output_tokens,
+        }
+    )
+
+    if not response.text:
+        raise ValueError("Gemini did not return any content")
+
+    return response.text
+
+# --- Sections the prompt asks for, matched against heading text ---
+REQUIRED_SECTIONS = {
+    'features': {
+        'label': 'Features',
+        'keywords': ('feature',),
+        'hint': 'List the key features as bullet points.',
+    },
+    'installation': {
+        'label': 'Installation',
+        'keywords': ('install', 'getting started', 'setup'),
+        'hint': 'Use numbered steps and put `git clone {repo_url}` in a bash code block.',
+    },
+    'usage': {
+        'label': 'Usage',
+        'keywords': ('usage', 'example'),
+        'hint': 'Show how to run or use the project with at least one code block.',
+    },
+    'technologies': {
+        'label': 'Technologies',
+        'keywords': ('technolog', 'tech stack', 'built with'),
+        'hint': 'Present the technologies as a Markdown table.',
+    },
+    'screenshots': {
+        'label': 'Screenshots',
+        'keywords': ('screenshot',),
+        'hint': 'Add placeholder image links for screenshots.',
+    },
+    'contributing': {
+        'label': 'Contributing',
+        'keywords': ('contribut',),
+        'hint': 'Give short contributing guidelines.',
+    },
+    'license': {
+        'label': 'License',
+        'keywords': ('license', 'licence'),
+        'hint': 'State the license: {license}.',
+    },
+}
+
+_HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+_FENCE_RE = re.compile(r'^\s*(```|~~~)')
+_TABLE_SEP_RE = re.compile(r'^\s*\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$')
+
+
+def _section_key(title):
+    title = title.lower()
+    for key, spec in REQUIRED_SECTIONS.items():
+        if any(word in title for word in spec['keywords']):
+            return key
+    return None
+
+
+def parse_readme_sections(content):
+    """
+    Split markdown into heading sections in a single pass over the lines.
+    Subsections stay inside their enclosing required section, so its checks
+    and any replacement cover the whole span.
+    """
+    sections = [{'key': None, 'level': 0, 'heading': None, 'lines': [], 'fences': 0,
+                 'table': False, 'truncated': False}]
+    fence = None
+    previous = ''
+    has_title = False
+
+    for line in content.splitlines():
+        current = sections[-1]
+        marker = _FENCE_RE.match(line)
+
+        if fence:
+            current['lines'].append(line)
+            if marker and marker.group(1) == fence:
+                fence = None
+            continue
+
+        if marker:
+            fence = marker.group(1)
+            current['fences'] += 1
+            current['lines'].append(line)
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            level = len(heading.group(1))
+            # Only the first H1 is the title; READMEs often use "#" for sections too
+            if level == 1 and not has_title:
+                key = 'title'
+                has_title = True
+            else:
+                key = _section_key(heading.group(2))
+
+            # Deeper headings belong to the enclosing required section, unless
+            # they start a different required section themselves
+            if (current['key'] in REQUIRED_SECTIONS and level > current['level']
+                    and key in (None, current['key'])):
+                current['lines'].append(line)
+                previous = ''
+                continue
+
+            sections.append({
+                'key': key,
+                'level': level,
+                'heading': line,
+                'lines': [],
+                'fences': 0,
+                'table': False,
+                'truncated': False,
+            })
+            previous = ''
+            continue
+
+        if '|' in previous and _TABLE_SEP_RE.match(line):
+            current['table'] = True
+        current['lines'].append(line)
+        previous = line
+
+    # An unclosed code fence means the response was cut off mid-section
+    if fence:
+        sections[-1]['truncated'] = True
+        sections[-1]['open_fence'] = fence
+
+    return sections
+
+
+def check_readme_structure(sections, repo_url="", required=True):
+    """
+    Return a {section_key: problem} dict for everything the prompt required.
+    With required=False only truncated sections are reported.
+    """
+    problems = {}
+    found = {}
+    for section in sections:
+        if section['key'] and section['key'] not in found:
+            found[section['key']] = section
+        if section['truncated']:
+            problems[section['key']] = 'truncated'
+
+    if not required:
+        return problems
+
+    if 'title' not in found:
+        problems.setdefault('title', 'missing')
+
+    for key in REQUIRED_SECTIONS:
+        if key not in found:
+            problems.setdefault(key, 'missing')
+
+    install = found.get('installation')
+    if install and repo_url and f"git clone {repo_url}" not in '\n'.join(install['lines']):
+        problems.setdefault('installation', 'missing clone command')
+
+    usage = found.get('usage')
+    if usage and not usage['fences']:
+        problems.setdefault('usage', 'missing code example')
+
+    tech = found.get('technologies')
+    if tech and not tech['table']:
+        problems.setdefault('technologies', 'missing table')
+
+    return problems
+
+
+def render_readme_sections(sections):
+    parts = []
+    for section in sections:
+        lines = ([section['heading']] if section['heading'] else []) + section['lines']
+        parts.append('\n'.join(lines))
+    return '\n'.join(parts).strip() + '\n'
+
+
+def generate_readme_section(key, repo_data, repo_url="", user_prompt=""):
+    """Ask the model for a single README section instead of the whole document"""
+    name = repo_data.get('name') or 'the project'
+    if key == 'title':
+        prompt = f"""
+Write only the title line and a one-paragraph description for the README.md of {name}.
+- **Description**: {repo_data.get('description') or 'No description provided'}
+- **User's Custom Prompt**: {user_prompt if user_prompt else 'N/A'}
+
+Start with a level-1 Markdown heading containing an emoji and return nothing else.
+"""
+    else:
+        spec = REQUIRED_SECTIONS[key]
+        hint = spec['hint'].format(
+            repo_url=repo_url,
+            license=repo_data.get('license') or 'Not specified',
+        )
+        prompt = f"""
+Write only the "{spec['label']}" section of the README.md for this GitHub repository:
+- **Name**: {name}
+- **Description**: {repo_data.get('description') or 'No description provided'}
+- **Languages**: {', '.join(repo_data.get('languages', {}).keys())}
+- **GitHub URL**: {repo_url}
+- **User's Custom Prompt**: {user_prompt if user_prompt else 'N/A'}
+
+{hint}
+Start with a level-2 Markdown heading containing an emoji and return nothing else.
+"""
+
+    text = _call_model(prompt, max_output_tokens=512)
+    return parse_readme_sections(text)[1:] or [{
+        'key': key, 'level': 2, 'heading': None, 'lines': text.strip().splitlines(),
+        'fences': 0, 'table': False, 'truncated': False,
+    }]
+
+
+MAX_SECTION_REPAIRS = 3
+SECTION_ORDER = ['title'] + list(REQUIRED_SECTIONS)
+
+def repair_readme(content, repo_data, repo_url="", user_prompt="", full_prompt=None):
+    """
+    Validate the README structure and regenerate only the broken sections.
+    When a custom prompt is given the user may have dropped sections on
+    purpose, so only truncation is repaired. Too many broken sections trigger
+    one full regeneration instead of a long run of per-section calls.
+    """
+    required = not user_prompt
+    sections = parse_readme_sections(content)
+    problems = check_readme_structure(sections, repo_url, required)
+    if not problems:
+        return content
+
+    if full_prompt and len(problems) > MAX_SECTION_REPAIRS:
+        regenerated = parse_readme_sections(_call_model(full_prompt, max_output_tokens=2048))
+        regenerated_problems = check_readme_structure(regenerated, repo_url, required)
+        if len(regenerated_problems) < len(problems):
+            sections, problems = regenerated, regenerated_problems
+
+    repairs = 0
+    for key in sorted(problems, key=lambda k: SECTION_ORDER.index(k) if k in SECTION_ORDER else -1):
+        if key is None:
+            # Truncated section we have no spec for: just close the fence
+            sections[-1]['lines'].append(sections[-1]['open_fence'])
+            sections[-1]['truncated'] = False
+            continue
+        if repairs >= MAX_SECTION_REPAIRS:
+            break
+        repairs += 1
+
+        replacement = generate_readme_section(key, repo_data, repo_url, user_prompt)
+        existing = next((i for i, s in enumerate(sections) if s['key'] == key), None)
+        if existing is not None:
+            sections[existing:existing + 1] = replacement
+            continue
+
+        later = SECTION_ORDER[SECTION_ORDER.index(key) + 1:]
+        position = next(
+            (i for i, s in enumerate(sections) if s['key'] in later),
+            len(sections),
+        )
+        sections[position:position] = replacement
+
+    repaired = render_readme_sections(sections)
+    remaining = check_readme_structure(parse_readme_sections(repaired), repo_url, required)
+    if remaining:
+        details = ', '.join(f"{key or 'section'} ({problem})" for key, problem in remaining.items())
+        print(f"WARNING: README still incomplete after repair: {details}")
+    return repaired
+
+# --- Apply editor deltas to stored README content ---
+def editor_text(content):
+    """Content as a browser textarea reports it, with every line break as a newline"""
+    return content.replace('\r\n', '\n').replace('\r', '\n')
+
+def editor_length(content):
+    """Length in UTF-16 code units, the unit of the browser's string indices"""
+    return len(editor_text(content).encode('utf-16-le')) // 2
+
+def apply_text_patch(content, changes):
+    """
+    Apply [start, end, text] splices to content. Offsets are UTF-16 code units
+    (what the browser's string indices count) into the original text, and the
+    splices must not overlap.
+    """
+    data = editor_text(content).encode('utf-16-le')
+    last_start = len(data) // 2
+    for change in sorted(changes, key=lambda c: c[0], reverse=True):
+        start, end, text = change
+        if not (isinstance(start, int) and isinstance(end, int) and isinstance(text, str)):
+            raise ValueError("Malformed patch")
+        if not 0 <= start <= end <= last_start:
+            raise ValueError("Patch does not apply to this version")
+        data = data[:start * 2] + text.encode('utf-16-le') + data[end * 2:]
+        last_start = start
+    try:
+        return data.decode('utf-16-le')
+    except UnicodeDecodeError:
+        raise ValueError("Patch splits a character")
+
 # --- Extract owner/repo from URL ---
 def extract_repo_info(url):
     parts = url.strip('/').split('/')
@@ -78,10 +390,26 @@ def get_repo_data(owner, repo_name):
     data['ingestion_summary'] = get_repo_ingestion_summary(repo)
     return data
 
-# generator/services.py (updated)
+# --- Files worth showing the model when summarising a repository ---
+KEY_FILES = [
+    'requirements.txt', 'package.json', 'Dockerfile',
+    'setup.py', 'Makefile', 'README.md', '.env.example',
+    'docker-compose.yml', 'config.json'
+]
+
+def is_key_file(name):
+    return name in KEY_FILES or name.endswith(('.py', '.js', '.md'))
 
 def get_repo_ingestion_summary(repo, max_files=25):
     """Improved repository analysis focusing on key files"""
+    if getattr(settings, 'REPO_INGESTION_BACKEND', 'api') == 'mirror':
+        try:
+            return get_mirror_ingestion_summary(
+                repo.full_name, repo.clone_url, repo.default_branch, max_files
+            )
+        except (MirrorError, OSError) as e:
+            print(f"WARNING: mirror ingestion failed, falling back to the API: {str(e)}")
+
     important_files = []
     
     try:
@@ -92,13 +420,7 @@ def get_repo_ingestion_summary(repo, max_files=25):
                 contents.extend(repo.get_contents(file_content.path))
             else:
                 # Focus on key files only
-                key_files = [
-                    'requirements.txt', 'package.json', 'Dockerfile',
-                    'setup.py', 'Makefile', 'README.md', '.env.example',
-                    'docker-compose.yml', 'config.json'
-                ]
-                
-                if file_content.name in key_files or file_content.name.endswith(('.py', '.js', '.md')):
+                if is_key_file(file_content.name):
                     try:
                         content = file_content.decoded_content.decode('utf-8', errors='ignore')
                         important_files.append({
@@ -116,6 +438,28 @@ def get_repo_ingestion_summary(repo, max_files=25):
         
     return important_files
 
+def get_mirror_ingestion_summary(full_name, clone_url, branch=None, max_files=25):
+    """Same summary as the API walk, read from a local shallow mirror"""
+    token = os.getenv('GITHUB_TOKEN')
+    pool = get_mirror_pool()
+    with pool.checkout(full_name, clone_url, branch, token) as path:
+        # Breadth-first like the contents API walk: shallow paths first
+        selected = [
+            (file_path, oid) for file_path, oid in sorted(
+                pool.list_files(path), key=lambda f: (f[0].count('/'), f[0])
+            )
+            if is_key_file(file_path.rsplit('/', 1)[-1])
+        ][:max_files]
+
+        blobs = pool.read_blobs(path, [oid for _, oid in selected], token)
+    return [
+        {
+            'path': file_path,
+            'content': blobs[oid].decode('utf-8', errors='ignore')[:1000]
+        }
+        for file_path, oid in selected if oid in blobs
+    ]
+
 def generate_readme_content(repo_data, user_prompt="", repo_url=""):
     """Improved prompt for professional README generation"""
     prompt = f"""
@@ -169,34 +513,19 @@ Generate a clean, well-formatted `README.md` file for the following repository:
 - Use tables for technologies
 - Clear, professional tone
 """
-    
-    # Rest of the function remains the same...
-
-
 
-    response = model.generate_content(
-        prompt,
-        safety_settings={
-            'HARM_CATEGORY_HARASSMENT': 'BLOCK_NONE',
-            'HARM_CATEGORY_HATE_SPEECH': 'BLOCK_NONE',
-            'HARM_CATEGORY_SEXUALLY_EXPLICIT': 'BLOCK_NONE',
-            'HARM_CATEGORY_DANGEROUS_CONTENT': 'BLOCK_NONE',
-        },
-        generation_config={
-            'temperature': 0.7,
-            'top_p': 0.9,
-            'max_output_tokens': 2048,
-        }
-    )
+    readme = validate_markdown(_call_model(prompt, max_output_tokens=2048))
+    return repair_readme(readme, repo_data, repo_url, user_prompt, full_prompt=prompt)
 
-    if not response.text:
-        raise ValueError("Gemini did not return any content")
+# --- Main entry point used by views.py ---
+def readme_cache_key(repo_url, user_prompt=""):
+    return f"readme_{repo_url}_{user_prompt}"
 
-    return validate_markdown(response.text)
+def get_cached_readme(repo_url, user_prompt=""):
+    return cache.get(readme_cache_key(repo_url, user_prompt))
 
-# --- Main entry point used by views.py ---
 def generate_readme(repo_url, user_prompt=""):
-    cache_key = f"readme_{repo_url}_{user_prompt}"
+    cache_key = readme_cache_key(repo_url, user_prompt)
     cached = cache.get(cache_key)
     if cached:
         return cached
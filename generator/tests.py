@@ -19,3 +19,425 @@ class ReadmeGenerationTest(TestCase):
         content = generate_readme_content(data, '', repo_url)
         self.assertIn(repo_url, content)
         self.assertIn(f"git clone {repo_url}", content)
+
+
+COMPLETE_README = """# 🚀 TestRepo
+
+A test project.
+
+## ✨ Features
+- Fast
+
+## 📦 Installation
+```bash
+git clone https://github.com/testuser/TestRepo
+```
+
+## ⚙️ Usage
+```python
+import testrepo
+```
+
+## 🛠️ Technologies
+| Tech | Use |
+|------|-----|
+| Python | Core |
+
+## 📸 Screenshots
+![Screenshot](https://via.placeholder.com/600)
+
+## 🤝 Contributing
+Open a pull request.
+
+## 📄 License
+MIT
+"""
+
+
+class ReadmeStructureTest(TestCase):
+    repo_url = 'https://github.com/testuser/TestRepo'
+    repo_data = {'name': 'TestRepo', 'languages': {'Python': 1000}, 'license': 'mit'}
+
+    def test_complete_readme_has_no_problems(self):
+        from .services import parse_readme_sections, check_readme_structure
+        sections = parse_readme_sections(COMPLETE_README)
+        self.assertEqual(check_readme_structure(sections, self.repo_url), {})
+
+    def test_detects_missing_sections_and_truncation(self):
+        from .services import parse_readme_sections, check_readme_structure
+        content = COMPLETE_README.split('## 🛠️ Technologies')[0].replace(
+            'import testrepo\n```', 'import testrepo')
+        problems = check_readme_structure(parse_readme_sections(content), self.repo_url)
+        self.assertEqual(problems['usage'], 'truncated')
+        self.assertEqual(problems['technologies'], 'missing')
+        self.assertEqual(problems['license'], 'missing')
+        self.assertNotIn('installation', problems)
+
+    def test_repair_only_regenerates_broken_section(self):
+        from unittest import mock
+        from . import services
+        content = COMPLETE_README.replace(
+            '| Tech | Use |\n|------|-----|\n| Python | Core |', 'Python')
+        section = '## 🛠️ Technologies\n| Tech | Use |\n|---|---|\n| Django | Web |\n'
+        with mock.patch.object(services, '_call_model', return_value=section) as call:
+            repaired = services.repair_readme(content, self.repo_data, self.repo_url)
+        call.assert_called_once()
+        self.assertIn('Technologies', call.call_args.args[0])
+        self.assertIn('| Django | Web |', repaired)
+        self.assertLess(repaired.index('Technologies'), repaired.index('Screenshots'))
+        self.assertEqual(repaired.count('## 🛠️ Technologies'), 1)
+
+    def test_h1_sections_are_matched_by_keyword(self):
+        from .services import parse_readme_sections, check_readme_structure
+        content = COMPLETE_README.replace('\n## ', '\n# ')
+        self.assertEqual(check_readme_structure(parse_readme_sections(content), self.repo_url), {})
+
+    def test_many_broken_sections_fall_back_to_one_full_regeneration(self):
+        from unittest import mock
+        from . import services
+        content = COMPLETE_README.split('## ✨ Features')[0]
+        with mock.patch.object(services, '_call_model', return_value=COMPLETE_README) as call:
+            repaired = services.repair_readme(content, self.repo_data, self.repo_url,
+                                              full_prompt='full prompt')
+        call.assert_called_once_with('full prompt', max_output_tokens=2048)
+        self.assertEqual(repaired, COMPLETE_README)
+
+    def test_custom_prompt_only_repairs_truncation(self):
+        from unittest import mock
+        from . import services
+        content = COMPLETE_README.split('## 🛠️ Technologies')[0]
+        with mock.patch.object(services, '_call_model') as call:
+            repaired = services.repair_readme(content, self.repo_data, self.repo_url,
+                                              user_prompt='Keep it short, no screenshots')
+        call.assert_not_called()
+        self.assertEqual(repaired, content)
+
+    def test_subsections_count_towards_their_parent_section(self):
+        from unittest import mock
+        from . import services
+        content = (COMPLETE_README
+                   .replace('## 📦 Installation\n', '## 📦 Installation\n### Steps\n')
+                   .replace('## ⚙️ Usage\n', '## ⚙️ Usage\n### Basic example\n')
+                   .replace('## 🛠️ Technologies\n', '## 🛠️ Technologies\n### Backend\n'))
+        sections = services.parse_readme_sections(content)
+        self.assertEqual(services.check_readme_structure(sections, self.repo_url), {})
+
+        broken = content.replace('| Python | Core |', '')
+        broken = broken.replace('| Tech | Use |\n|------|-----|\n', 'Python\n')
+        section = '## 🛠️ Technologies\n| Tech | Use |\n|---|---|\n| Django | Web |\n'
+        with mock.patch.object(services, '_call_model', return_value=section) as call:
+            repaired = services.repair_readme(broken, self.repo_data, self.repo_url)
+        call.assert_called_once()
+        self.assertNotIn('### Backend', repaired)
+        self.assertEqual(repaired.count('Technologies'), 1)
+        self.assertEqual(repaired.count('| Django | Web |'), 1)
+        self.assertIn('### Steps', repaired)
+
+    def test_truncated_tilde_fence_is_closed_with_tildes(self):
+        from unittest import mock
+        from . import services
+        content = COMPLETE_README + '\n## Notes\n~~~text\ncut off'
+        with mock.patch.object(services, '_call_model') as call:
+            repaired = services.repair_readme(content, self.repo_data, self.repo_url)
+        call.assert_not_called()
+        self.assertTrue(repaired.endswith('cut off\n~~~\n'))
+
+
+class AdmissionControlTest(TestCase):
+    repo_url = 'https://github.com/testuser/TestRepo'
+
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+
+    def test_client_bucket_returns_429_with_retry_after(self):
+        from unittest import mock
+        from django.test import override_settings
+        with override_settings(GENERATION_CLIENT_RATE=(1, 60)), \
+                mock.patch('generator.views.push_to_github', return_value=(True, 'ok')):
+            first = self.client.post('/push/', {'repo_url': self.repo_url, 'readme_content': '# Hi'})
+            second = self.client.post('/push/', {'repo_url': self.repo_url, 'readme_content': '# Hi'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 429)
+        self.assertIn(int(second['Retry-After']), range(1, 61))
+        self.assertFalse(second.json()['success'])
+
+    def test_throttled_form_post_renders_home_page(self):
+        from unittest import mock
+        from django.test import override_settings
+        with override_settings(GENERATION_CLIENT_RATE=(1, 60)), \
+                mock.patch('generator.views.generate_readme', return_value=COMPLETE_README):
+            self.client.post('/', {'repo_url': self.repo_url})
+            response = self.client.post('/', {'repo_url': self.repo_url})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertTemplateUsed(response, 'home.html')
+        self.assertContains(response, 'Rate limit exceeded', status_code=429)
+
+    def test_generate_and_push_use_separate_buckets(self):
+        from unittest import mock
+        from django.test import override_settings
+        with override_settings(GENERATION_REPO_RATE=(1, 60)), \
+                mock.patch('generator.views.generate_readme', return_value=COMPLETE_README), \
+                mock.patch('generator.views.push_to_github', return_value=(True, 'ok')):
+            generated = self.client.post('/', {'repo_url': self.repo_url})
+            pushed = self.client.post('/push/', {'repo_url': self.repo_url, 'readme_content': '# Hi'})
+        self.assertEqual(generated.status_code, 200)
+        self.assertEqual(pushed.status_code, 200)
+
+    def test_cache_hits_bypass_limits(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from django.test import override_settings
+        from .services import readme_cache_key
+        cache.set(readme_cache_key(self.repo_url), COMPLETE_README)
+        with override_settings(GENERATION_CLIENT_RATE=(1, 60)), \
+                mock.patch('generator.views.generate_readme', return_value=COMPLETE_README):
+            responses = [self.client.post('/', {'repo_url': f'  {self.repo_url} '}) for _ in range(3)]
+        self.assertEqual([r.status_code for r in responses], [200, 200, 200])
+
+    def test_sliding_window_counts_previous_window(self):
+        from .throttling import take_tokens
+        bucket = [('throttle_test', (2, 60))]
+        self.assertEqual(take_tokens(bucket, now=60), 0)
+        self.assertEqual(take_tokens(bucket, now=61), 0)
+        self.assertEqual(take_tokens(bucket, now=62), 58)
+        # Halfway into the next window the previous two count as one
+        self.assertEqual(take_tokens(bucket, now=150), 0)
+        self.assertEqual(take_tokens(bucket, now=151), 29)
+
+    def test_full_queue_rejects_immediately(self):
+        from .throttling import AdmissionQueue
+        queue = AdmissionQueue(max_concurrent=1, max_queue=0)
+        self.assertTrue(queue.acquire(timeout=1))
+        self.assertFalse(queue.acquire(timeout=1))
+        queue.release()
+        self.assertTrue(queue.acquire(timeout=1))
+
+
+class ReadmePatchTest(TestCase):
+    repo_url = 'https://github.com/testuser/TestRepo'
+
+    def setUp(self):
+        from .models import Repository
+        self.repo = Repository.objects.create(url=self.repo_url, readme_content='# 🚀 Test\r\nOld text\n')
+
+    def _patch(self, version, changes, base_length=19):
+        import json
+        return self.client.post(
+            '/edit/patch/',
+            json.dumps({'repo_url': self.repo_url, 'version': version,
+                        'base_length': base_length, 'changes': changes}),
+            content_type='application/json'
+        )
+
+    def test_apply_text_patch_uses_utf16_offsets(self):
+        from .services import apply_text_patch
+        # The rocket emoji is two UTF-16 code units, and CRLF counts as one newline
+        self.assertEqual(apply_text_patch('# 🚀 Test\r\nOld', [[10, 13, 'New']]), '# 🚀 Test\nNew')
+        with self.assertRaises(ValueError):
+            apply_text_patch('abc', [[2, 9, 'x']])
+
+    def test_patch_applies_and_bumps_version(self):
+        response = self._patch(1, [[10, 13, 'New']])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"2"')
+        self.repo.refresh_from_db()
+        self.assertEqual(self.repo.readme_content, '# 🚀 Test\nNew text\n')
+        self.assertEqual(self.repo.version, 2)
+
+    def test_stale_version_is_rejected(self):
+        self.assertEqual(self._patch(1, [[10, 13, 'New']]).status_code, 200)
+        response = self._patch(1, [[10, 13, 'Other']])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+        self.repo.refresh_from_db()
+        self.assertIn('New text', self.repo.readme_content)
+
+    def test_full_save_requires_version(self):
+        response = self.client.post('/edit/save/', {'repo_url': self.repo_url, 'readme_content': '# New'})
+        self.assertEqual(response.status_code, 428)
+        response = self.client.post('/edit/save/', {'repo_url': self.repo_url,
+                                                     'readme_content': '# New', 'version': 1})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post('/edit/save/', {'repo_url': self.repo_url,
+                                                     'readme_content': '# Other', 'version': 1})
+        self.assertEqual(response.status_code, 409)
+
+    def test_full_save_status_codes(self):
+        response = self.client.post('/edit/save/', {'repo_url': 'https://github.com/x/missing',
+                                                     'readme_content': '# New', 'version': 1})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post('/edit/save/', {'repo_url': self.repo_url, 'version': 1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_base_length_mismatch_is_rejected(self):
+        response = self._patch(1, [[10, 13, 'New']], base_length=20)
+        self.assertEqual(response.status_code, 409)
+        self.repo.refresh_from_db()
+        self.assertEqual(self.repo.version, 1)
+
+    def test_leading_newline_survives_textarea(self):
+        self.repo.readme_content = '\n# Title\n'
+        self.repo.save()
+        response = self.client.get('/edit/', {'repo': self.repo_url})
+        self.assertContains(response, '<textarea id="editor">\n\n# Title')
+
+
+class HttpCachingTest(TestCase):
+    repo_url = 'https://github.com/testuser/TestRepo'
+
+    def setUp(self):
+        from .models import Repository
+        self.repo = Repository.objects.create(url=self.repo_url, readme_content=COMPLETE_README)
+        self.client.cookies['csrftoken'] = 'a' * 32
+
+    def test_first_visit_without_csrf_cookie_is_not_tagged(self):
+        del self.client.cookies['csrftoken']
+        response = self.client.get('/edit/', {'repo': self.repo_url})
+        self.assertNotIn('ETag', response)
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_rotated_csrf_cookie_invalidates_etags(self):
+        for path, params in (('/', {}), ('/edit/', {'repo': self.repo_url})):
+            etag = self.client.get(path, params)['ETag']
+            self.client.cookies['csrftoken'] = 'b' * 32
+            response = self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.client.cookies['csrftoken'] = 'a' * 32
+
+    def test_edit_page_revalidates_with_304(self):
+        first = self.client.get('/edit/', {'repo': self.repo_url})
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('no-cache', first['Cache-Control'])
+        self.assertIn('Last-Modified', first)
+        second = self.client.get('/edit/', {'repo': self.repo_url}, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 304)
+
+    def test_edit_etag_changes_with_content(self):
+        import json
+        from .services import editor_length
+        etag = self.client.get('/edit/', {'repo': self.repo_url})['ETag']
+        self.client.post(
+            '/edit/patch/',
+            json.dumps({'repo_url': self.repo_url, 'version': 1,
+                        'base_length': editor_length(COMPLETE_README), 'changes': [[0, 1, '#']]}),
+            content_type='application/json'
+        )
+        response = self.client.get('/edit/', {'repo': self.repo_url}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_home_is_gzipped(self):
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            self.client.get('/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+        )
+
+
+class MirrorIngestionTest(TestCase):
+    def setUp(self):
+        import os
+        import tempfile
+        from .mirrors import _git
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.work = os.path.join(self.tmp.name, 'work')
+        self.origin = os.path.join(self.tmp.name, 'origin.git')
+        self.url = 'file://' + self.origin
+
+        _git(['init', '-q', '-b', 'main', self.work])
+        self._commit({'setup.py': 'from setuptools import setup\n', 'docs/guide.md': '# Guide\n',
+                      'assets/logo.png': 'not a key file'})
+        _git(['clone', '-q', '--bare', self.work, self.origin])
+        _git(['config', 'uploadpack.allowFilter', 'true'], cwd=self.origin)
+        _git(['config', 'uploadpack.allowAnySHA1InWant', 'true'], cwd=self.origin)
+
+    def _commit(self, files):
+        import os
+        from .mirrors import _git
+        for name, content in files.items():
+            os.makedirs(os.path.dirname(os.path.join(self.work, name)), exist_ok=True)
+            with open(os.path.join(self.work, name), 'w') as f:
+                f.write(content)
+        _git(['add', '-A'], cwd=self.work)
+        _git(['-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+              'commit', '-q', '-m', 'update'], cwd=self.work)
+
+    def _summary(self, max_bytes=10 ** 9):
+        import os
+        from django.test import override_settings
+        from .services import get_mirror_ingestion_summary
+        with override_settings(MIRROR_ROOT=os.path.join(self.tmp.name, 'mirrors'),
+                               MIRROR_MAX_BYTES=max_bytes):
+            return get_mirror_ingestion_summary('testuser/TestRepo', self.url, 'main')
+
+    def test_reads_key_files_from_mirror(self):
+        summary = self._summary()
+        self.assertEqual([f['path'] for f in summary], ['setup.py', 'docs/guide.md'])
+        self.assertEqual(summary[1]['content'], '# Guide\n')
+
+    def test_repeat_sync_fetches_new_commits(self):
+        from .mirrors import _git
+        self._summary()
+        self._commit({'package.json': '{}\n'})
+        _git(['push', '-q', self.origin, 'main'], cwd=self.work)
+        self.assertIn('package.json', [f['path'] for f in self._summary()])
+
+    def test_evicts_least_recently_used_mirror(self):
+        import os
+        from .mirrors import MirrorPool
+        pool = MirrorPool(os.path.join(self.tmp.name, 'pool'), max_bytes=1, min_idle=0)
+        with pool.checkout('testuser/First', self.url, 'main') as first:
+            pass
+        with pool.checkout('testuser/Second', self.url, 'main') as second:
+            self.assertTrue(os.path.exists(second))
+        self.assertFalse(os.path.exists(first))
+
+    def test_recently_used_mirror_is_not_evicted(self):
+        import os
+        from .mirrors import MirrorPool
+        pool = MirrorPool(os.path.join(self.tmp.name, 'pool'), max_bytes=1)
+        with pool.checkout('testuser/First', self.url, 'main') as first:
+            pass
+        with pool.checkout('testuser/Second', self.url, 'main'):
+            pass
+        self.assertTrue(os.path.exists(first))
+
+    def test_broken_mirror_is_recloned(self):
+        import os
+        import shutil
+        from .mirrors import MirrorPool
+        pool = MirrorPool(os.path.join(self.tmp.name, 'pool'), max_bytes=10 ** 9)
+        with pool.checkout('testuser/TestRepo', self.url, 'main') as path:
+            pass
+        shutil.rmtree(os.path.join(path, 'objects'))
+        with pool.checkout('testuser/TestRepo', self.url, 'main') as path:
+            self.assertIn('setup.py', [name for name, _ in pool.list_files(path)])
+
+    def test_pool_within_budget_is_not_rescanned(self):
+        import os
+        from unittest import mock
+        from . import mirrors
+        pool = mirrors.MirrorPool(os.path.join(self.tmp.name, 'pool'), max_bytes=10 ** 9)
+        with pool.checkout('testuser/First', self.url, 'main'):
+            pass
+        with mock.patch.object(pool, 'evict') as evict:
+            with pool.checkout('testuser/Second', self.url, 'main'):
+                pass
+        evict.assert_not_called()
+
+    def test_filesystem_errors_fall_back_to_api(self):
+        import os
+        from unittest import mock
+        from django.test import override_settings
+        from .services import get_repo_ingestion_summary
+        blocker = os.path.join(self.tmp.name, 'not-a-dir')
+        open(blocker, 'w').close()
+        repo = mock.Mock(full_name='testuser/TestRepo', clone_url=self.url, default_branch='main')
+        repo.get_contents.return_value = []
+        with override_settings(REPO_INGESTION_BACKEND='mirror',
+                               MIRROR_ROOT=os.path.join(blocker, 'mirrors')):
+            self.assertEqual(get_repo_ingestion_summary(repo), [])
+        repo.get_contents.assert_called_once_with("")
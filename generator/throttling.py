@@ -0,0 +1,166 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, JsonResponse
+
+# Defaults, overridable in settings.py
+DEFAULT_CLIENT_RATE = (5, 60)     # requests per seconds, per client IP
+DEFAULT_REPO_RATE = (3, 60)       # requests per seconds, per target repository
+DEFAULT_MAX_CONCURRENT = 4        # generations running at once in each process
+DEFAULT_MAX_QUEUE = 8             # requests allowed to wait for a slot
+DEFAULT_QUEUE_TIMEOUT = 10        # seconds a queued request waits before giving up
+
+
+# --- Sliding-window rate limits kept in the Django cache ---
+def _release(keys):
+    for key in keys:
+        try:
+            cache.decr(key)
+        except ValueError:
+            pass
+
+
+def take_tokens(buckets, now=None):
+    """
+    Count one request against every (key, (requests, seconds)) limit, or none.
+    Returns 0 when admitted, otherwise the seconds until a request would be.
+
+    Counters are updated with cache.add/cache.incr and use wall-clock time, so
+    the limits hold across processes and hosts sharing a cache backend.
+    """
+    now = time.time() if now is None else now
+    taken = []
+    for key, (capacity, period) in buckets:
+        window = int(now // period)
+        current_key = f"{key}_{window}"
+        cache.add(current_key, 0, timeout=period * 2)
+        try:
+            count = cache.incr(current_key)
+        except ValueError:
+            # Expired between add and incr
+            cache.add(current_key, 1, timeout=period * 2)
+            count = 1
+        taken.append(current_key)
+
+        # Weight the previous window by how much of it still overlaps
+        previous = cache.get(f"{key}_{window - 1}", 0)
+        elapsed = now - window * period
+        if previous * (1 - elapsed / period) + count <= capacity:
+            continue
+
+        _release(taken)
+        if previous and count <= capacity:
+            wait = period * (1 - (capacity - count) / previous) - elapsed
+        else:
+            wait = period - elapsed
+        return max(1, math.ceil(wait))
+    return 0
+
+
+# --- Bounded queue in front of this process's generation workers ---
+class AdmissionQueue:
+    def __init__(self, max_concurrent, max_queue):
+        self.max_queue = max_queue
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def acquire(self, timeout):
+        """Wait for a free slot; refuse immediately when the queue is full"""
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                return False
+            self._waiting += 1
+        try:
+            return self._slots.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_admission_queue():
+    max_concurrent = getattr(settings, 'GENERATION_MAX_CONCURRENT', DEFAULT_MAX_CONCURRENT)
+    max_queue = getattr(settings, 'GENERATION_MAX_QUEUE', DEFAULT_MAX_QUEUE)
+    with _queues_lock:
+        key = (max_concurrent, max_queue)
+        if key not in _queues:
+            _queues[key] = AdmissionQueue(max_concurrent, max_queue)
+        return _queues[key]
+
+
+def get_client_ip(request):
+    return request.META.get('REMOTE_ADDR', 'unknown')
+
+
+def _too_many_requests(request, reject, as_json, retry_after, message):
+    if reject:
+        response = reject(request, message)
+        response.status_code = 429
+    elif as_json:
+        response = JsonResponse({"success": False, "error": message}, status=429)
+    else:
+        response = HttpResponse(message, status=429, content_type='text/plain')
+    response['Retry-After'] = str(max(1, int(retry_after)))
+    return response
+
+
+def admission_control(scope, get_repo_url, is_cache_hit=None, as_json=False, reject=None):
+    """
+    Rate limit POSTs per client and per target repo, then run them through a
+    bounded queue. Requests that can be answered from cache skip both.
+
+    Each scope has its own buckets, so generating a README and pushing it
+    draw on separate budgets (they spend separate Gemini and GitHub quotas).
+    reject(request, message) builds the 429 page for HTML views.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'POST':
+                return view(request, *args, **kwargs)
+
+            if is_cache_hit and is_cache_hit(request):
+                return view(request, *args, **kwargs)
+
+            buckets = [(
+                f"throttle_{scope}_client_{get_client_ip(request)}",
+                getattr(settings, 'GENERATION_CLIENT_RATE', DEFAULT_CLIENT_RATE),
+            )]
+            repo_url = get_repo_url(request)
+            if repo_url:
+                buckets.append((
+                    f"throttle_{scope}_repo_{repo_url.strip('/').lower()}",
+                    getattr(settings, 'GENERATION_REPO_RATE', DEFAULT_REPO_RATE),
+                ))
+
+            wait = take_tokens(buckets)
+            if wait:
+                return _too_many_requests(
+                    request, reject, as_json, wait, "Rate limit exceeded. Please try again later."
+                )
+
+            queue = get_admission_queue()
+            timeout = getattr(settings, 'GENERATION_QUEUE_TIMEOUT', DEFAULT_QUEUE_TIMEOUT)
+            if not queue.acquire(timeout):
+                return _too_many_requests(
+                    request, reject, as_json, timeout, "Server is busy. Please try again shortly."
+                )
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                queue.release()
+        return wrapper
+    return decorator
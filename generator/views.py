@@ -1,14 +1,72 @@
+import hashlib
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.views.decorators.cache import never_cache
-from django.views.decorators.http import require_http_methods
+from django.db.models import F
+from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, conditional_page, require_http_methods
 from .forms import RepoForm
-from .services import generate_readme
+from .services import generate_readme, get_cached_readme, apply_text_patch, editor_length
 from .models import Repository
+from .throttling import admission_control
 from markdown import markdown
 
-@never_cache
+
+def _posted_repo_url(request):
+    return request.POST.get('repo_url', '').strip()
+
+def _cleaned_generation(request):
+    """Repo URL and prompt exactly as home() will see them after form cleaning"""
+    if not hasattr(request, '_cleaned_generation'):
+        form = RepoForm(request.POST)
+        if form.is_valid():
+            request._cleaned_generation = (
+                form.cleaned_data['repo_url'],
+                form.cleaned_data.get('custom_prompt', '')
+            )
+        else:
+            request._cleaned_generation = (_posted_repo_url(request), '')
+    return request._cleaned_generation
+
+def _generation_repo_url(request):
+    return _cleaned_generation(request)[0]
+
+def _is_cached_generation(request):
+    return bool(get_cached_readme(*_cleaned_generation(request)))
+
+def _home_rejected(request, message):
+    messages.error(request, message)
+    return render(request, 'home.html', {
+        'form': RepoForm(request.POST),
+        'recent_repos': Repository.objects.order_by('-created_at')[:5]
+    })
+
+def _csrf_fingerprint(request):
+    """
+    Short hash of the CSRF secret the page's token is derived from. Pages that
+    embed a token must not revalidate once the secret rotates. None when the
+    request has no secret yet, so the page renders and sets the cookie.
+    """
+    secret = request.META.get('CSRF_COOKIE')
+    if not secret or request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        return None
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
+def _home_etag(request):
+    # Pending flash messages are rendered into the page, so skip validation then
+    if request.method != 'GET' or len(messages.get_messages(request)):
+        return None
+    csrf = _csrf_fingerprint(request)
+    if csrf is None:
+        return None
+    recent = Repository.objects.order_by('-created_at').values_list('id', 'updated_at')[:5]
+    return f"{csrf}-{hashlib.sha256(repr(list(recent)).encode()).hexdigest()[:32]}"
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_home_etag)
 @require_http_methods(["GET", "POST"])
+@admission_control('generate', _generation_repo_url,
+                   is_cache_hit=_is_cached_generation, reject=_home_rejected)
 def home(request):
     if request.method == 'POST':
         form = RepoForm(request.POST)
@@ -24,7 +82,11 @@ def home(request):
                 # Save to database
                 Repository.objects.update_or_create(
                     url=repo_url,
-                    defaults={'readme_content': readme_content}
+                    defaults={
+                        'readme_content': readme_content,
+                        'version': F('version') + 1,
+                    },
+                    create_defaults={'readme_content': readme_content}
                 )
 
                 return render(request, 'result.html', {
@@ -49,44 +111,145 @@ def home(request):
         'recent_repos': Repository.objects.order_by('-created_at')[:5]
     })
 
-@never_cache
+@cache_control(private=True, no_cache=True)
+@conditional_page
 def about(request):
     return render(request, 'about.html')
 
 
 
+import json
 from urllib.parse import unquote
-from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 
-@never_cache
+def _edit_validators(request):
+    """Fetch the columns the edit page's ETag/Last-Modified depend on, once per request"""
+    if not hasattr(request, '_readme_validators'):
+        request._readme_validators = Repository.objects.filter(
+            url=unquote(request.GET.get('repo', ''))
+        ).values('readme_content', 'version', 'updated_at').first()
+    return request._readme_validators
+
+def _edit_etag(request):
+    if len(messages.get_messages(request)):
+        return None
+    row = _edit_validators(request)
+    csrf = _csrf_fingerprint(request)
+    if row is None or csrf is None:
+        return None
+    # The page embeds the row version and a CSRF token, so both are part of the tag
+    digest = hashlib.sha256(row['readme_content'].encode()).hexdigest()[:32]
+    return f"{row['version']}-{csrf}-{digest}"
+
+def _edit_last_modified(request):
+    row = _edit_validators(request)
+    if row is None or _csrf_fingerprint(request) is None:
+        return None
+    return row['updated_at']
+
+@cache_control(private=True, no_cache=True)
 @require_http_methods(["GET"])
+@condition(etag_func=_edit_etag, last_modified_func=_edit_last_modified)
 def edit_readme(request):
     repo_url = unquote(request.GET.get('repo', ''))
     try:
         repo = Repository.objects.get(url=repo_url)
         return render(request, 'edit.html', {
             'readme_content': repo.readme_content,
+            'readme_version': repo.version,
             'repo_url': repo_url
         })
     except Repository.DoesNotExist:
         messages.error(request, "Repository not found")
         return redirect('home')
 
-@csrf_exempt
+
+def _commit_readme(repo_url, base_version, content):
+    """
+    Write content only if the row is still at base_version, touching just the
+    README columns. Returns the new version, or None on a conflict.
+    """
+    updated = Repository.objects.filter(url=repo_url, version=base_version).update(
+        readme_content=content,
+        version=F('version') + 1,
+        updated_at=timezone.now()
+    )
+    return base_version + 1 if updated else None
+
+def _conflict_response(repo_url):
+    current = Repository.objects.filter(url=repo_url).values_list('version', flat=True).first()
+    if current is None:
+        return JsonResponse({"success": False, "error": "Repository not found"}, status=404)
+    response = JsonResponse({
+        "success": False,
+        "conflict": True,
+        "version": current,
+        "error": "README was changed elsewhere. Reload to get the latest version."
+    }, status=409)
+    response['ETag'] = f'"{current}"'
+    return response
+
+def _saved_response(version):
+    response = JsonResponse({"success": True, "version": version})
+    response['ETag'] = f'"{version}"'
+    return response
+
+def _requested_version(request, value):
+    if_match = request.headers.get('If-Match', '').strip('"')
+    return int(if_match or value)
+
 @require_http_methods(["POST"])
 def save_readme(request):
+    """
+    Full-body save. Like patch_readme it must name the version it was edited
+    from (form field or If-Match), so concurrent editors cannot overwrite
+    each other blindly.
+    """
     try:
-        repo_url = request.POST.get('repo_url')
-        content = request.POST.get('readme_content')
+        repo_url = request.POST['repo_url']
+        content = request.POST['readme_content']
 
-        repo = Repository.objects.get(url=repo_url)
-        repo.readme_content = content
-        repo.save()
+        if not request.POST.get('version') and 'If-Match' not in request.headers:
+            return JsonResponse({
+                "success": False,
+                "error": "Send the README version being edited (version or If-Match)"
+            }, status=428)
+        base_version = _requested_version(request, request.POST.get('version'))
 
-        return JsonResponse({"success": True})
-    except Exception as e:
-        return JsonResponse({"success": False, "error": str(e)})
+        version = _commit_readme(repo_url, base_version, content)
+        if version is None:
+            return _conflict_response(repo_url)
+        return _saved_response(version)
+    except (KeyError, TypeError, ValueError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
+
+@require_http_methods(["POST"])
+def patch_readme(request):
+    """
+    Apply editor deltas:
+    {"repo_url", "version", "base_length", "changes": [[start, end, text], ...]}.
+    Stale versions, or a base text whose length differs from what the client
+    diffed against, get a 409 so a splice is never applied in the wrong place.
+    """
+    try:
+        payload = json.loads(request.body)
+        repo_url = payload['repo_url']
+        base_version = _requested_version(request, payload.get('version'))
+        base_length = payload['base_length']
+
+        repo = Repository.objects.only('readme_content', 'version').get(url=repo_url)
+        if repo.version != base_version or editor_length(repo.readme_content) != base_length:
+            return _conflict_response(repo_url)
+
+        content = apply_text_patch(repo.readme_content, payload.get('changes', []))
+        version = _commit_readme(repo_url, base_version, content)
+        if version is None:
+            return _conflict_response(repo_url)
+        return _saved_response(version)
+    except Repository.DoesNotExist:
+        return JsonResponse({"success": False, "error": "Repository not found"}, status=404)
+    except (KeyError, TypeError, ValueError) as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=400)
 
 
 
@@ -95,7 +258,7 @@ def save_readme(request):
 from .services import push_to_github
 
 @require_http_methods(["POST"])
-@csrf_exempt
+@admission_control('push', _posted_repo_url, as_json=True)
 def push_readme(request):
     try:
         repo_url = request.POST.get('repo_url')
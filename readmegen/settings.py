@@ -42,7 +42,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'django.middleware.gzip.GZipMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -117,6 +119,21 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Fingerprinted, pre-compressed (gzip/brotli) static files served with
+# far-future cache headers by WhiteNoise. Plain storage while developing.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.StaticFilesStorage' if DEBUG
+            else 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+        ),
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -139,4 +156,21 @@ SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 
 # SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Or 'django.contrib.sessions.backends.cached_db'
 SESSION_COOKIE_AGE = 3600  # 1 hour
-SESSION_SAVE_EVERY_REQUEST = True
\ No newline at end of file
+SESSION_SAVE_EVERY_REQUEST = True
+
+# Admission control for README generation and GitHub pushes
+GENERATION_CLIENT_RATE = (5, 60)  # requests per 60 seconds per client IP
+GENERATION_REPO_RATE = (3, 60)    # requests per 60 seconds per repository
+GENERATION_MAX_CONCURRENT = 4     # generations running at once
+GENERATION_MAX_QUEUE = 8          # requests waiting for a free slot
+GENERATION_QUEUE_TIMEOUT = 10     # seconds before a queued request gets a 429
+
+
+# Repository ingestion: 'api' walks the GitHub contents API, 'mirror' reads key
+# files from local shallow git mirrors (worth it for repos regenerated often).
+# Mirror failures fall back to the API.
+REPO_INGESTION_BACKEND = 'api'
+MIRROR_ROOT = BASE_DIR / 'mirrors'
+MIRROR_MAX_BYTES = 2 * 1024 ** 3  # LRU-evict mirrors beyond 2 GiB
+MIRROR_MIN_IDLE = 300             # never evict a mirror used in the last 5 minutes
+GIT_TIMEOUT = 30                  # seconds per git command before falling back